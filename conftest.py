@@ -113,9 +113,13 @@ def flask_app():
     import sys
     sys.path.append('/Users/andreaaranda/Desktop/spotify-pipeline')
     
-    from run import app
+    from run import app, profile_cache
+    from scripts.spotify_clients import clients
     app.config['TESTING'] = True
     app.config['SECRET_KEY'] = 'test_secret_key'
+    app.config['PROFILE_PREFETCH'] = False
+    profile_cache.clear()
+    clients.clear()
     
     with app.test_client() as client:
         with app.app_context():
@@ -1,12 +1,18 @@
 from flask import Flask, redirect, request, session, url_for, render_template
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import MemoryCacheHandler
 from dotenv import load_dotenv
 from pathlib import Path
 import pandas as pd
-from sqlalchemy import create_engine, text
 from scripts.visualizations import generar_top_tracks, generar_popularidad_artistas
+from scripts.cache import TTLCache
+from scripts.db_utils import upsert_tracks
+from scripts.db_engine import get_engine
+from scripts.spotify_clients import clients
 
 # Cargar variables de entorno
 load_dotenv(dotenv_path=Path('.') / '.env')
@@ -20,14 +26,36 @@ SPOTIPY_CLIENT_SECRET = os.getenv("SPOTIPY_CLIENT_SECRET")
 SPOTIPY_REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI")
 SCOPE = "user-top-read"
 
-# Configuración DB
-DB_USER = os.getenv("POSTGRES_USER")
-DB_PASS = os.getenv("POSTGRES_PASSWORD")
-DB_HOST = os.getenv("POSTGRES_HOST")
-DB_PORT = os.getenv("POSTGRES_PORT")
-DB_NAME = os.getenv("POSTGRES_DB")
+# Configuración DB (engine y pool compartidos, ver scripts/db_engine.py)
+engine = get_engine()
+
+# Cache de perfiles por (user_id, time_range): tracks + gráficas ya renderizadas
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 300))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 1024))
+profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+# Precarga en segundo plano de los tres rangos tras el login
+TIME_RANGES = ("short_term", "medium_term", "long_term")
+app.config['PROFILE_PREFETCH'] = os.getenv("PROFILE_PREFETCH", "1") == "1"
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", 10))
+prefetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PREFETCH_WORKERS", 6)),
+                                       thread_name_prefix="prefetch")
+pending_profiles = {}
+pending_lock = threading.Lock()
+
+def get_oauth():
+    # Un único auth manager para la app; el token de cada usuario vive en su sesión, no en .cache
+    return clients.get_or_create(('oauth', SCOPE), lambda: SpotifyOAuth(
+        client_id=SPOTIPY_CLIENT_ID,
+        client_secret=SPOTIPY_CLIENT_SECRET,
+        redirect_uri=SPOTIPY_REDIRECT_URI,
+        scope=SCOPE,
+        cache_handler=MemoryCacheHandler()
+    ))
 
-engine = create_engine(f'postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}')
+def user_client(token_info, user_id=None):
+    # Cliente reutilizado por usuario (sesión keep-alive compartida, token refrescado en el sitio)
+    return clients.user_client(token_info, oauth=get_oauth(), user_id=user_id)
 
 @app.route('/')
 def home():
@@ -38,52 +66,34 @@ def login():
     time_range = session.get("time_range", "medium_term")
     session["time_range"] = time_range
 
-    sp_oauth = SpotifyOAuth(
-        client_id=SPOTIPY_CLIENT_ID,
-        client_secret=SPOTIPY_CLIENT_SECRET,
-        redirect_uri=SPOTIPY_REDIRECT_URI,
-        scope=SCOPE
-    )
-    auth_url = sp_oauth.get_authorize_url()
+    auth_url = get_oauth().get_authorize_url()
     return redirect(auth_url)
 
 @app.route('/callback')
 def callback():
-    sp_oauth = SpotifyOAuth(
-        client_id=SPOTIPY_CLIENT_ID,
-        client_secret=SPOTIPY_CLIENT_SECRET,
-        redirect_uri=SPOTIPY_REDIRECT_URI,
-        scope=SCOPE
-    )
     code = request.args.get('code')
-    token_info = sp_oauth.get_access_token(code)
+    if not code:
+        return redirect(url_for('login'))
+    # check_cache=False: el auth manager es compartido, nunca debe devolver el token de otro usuario
+    token_info = get_oauth().get_access_token(code, check_cache=False)
     session['token_info'] = token_info
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp, _ = user_client(token_info)
     user_profile = sp.current_user()
     session['user_id'] = user_profile['id']
     print(f"Logged in user_id: {user_profile['id']}")
+    if app.config['PROFILE_PREFETCH']:
+        prefetch_profiles(token_info, user_profile['id'])
     return redirect(url_for('profile'))
 
-@app.route('/profile', methods=['GET'])
-def profile():
-    token_info = session.get('token_info')
-    if not token_info:
-        return redirect(url_for('login'))
-
-    time_range = request.args.get("time_range", "medium_term")
-    sp = spotipy.Spotify(auth=token_info['access_token'])
-
-    user_id = session.get('user_id')
-    print(f"Session user_id: {user_id}")
-    if not user_id:
-        return redirect(url_for('login'))
-
+def build_profile(sp, user_id, time_range):
     top_tracks = sp.current_user_top_tracks(limit=50, time_range=time_range)
 
     track_data = []
-    for track in top_tracks['items']:
+    for rank, track in enumerate(top_tracks['items'], start=1):
         track_data.append({
             "user_id": user_id,
+            "rank": rank,
+            "track_id": track.get('id'),
             "track_name": track['name'],
             "artists": ", ".join([artist['name'] for artist in track['artists']]),
             "album": track['album']['name'],
@@ -95,13 +105,6 @@ def profile():
 
     df = pd.DataFrame(track_data)
 
-    # Eliminar anteriores
-    with engine.begin() as conn:
-        conn.execute(
-            text("DELETE FROM multiuser_tracks WHERE user_id = :uid AND time_range = :tr"),
-            {"uid": user_id, "tr": time_range}
-        )
-
     # Calcula el número de artistas únicos
     num_artistas_unicos = df['artists'].explode().nunique()
     df['artists_list'] = df['artists'].str.split(', ')
@@ -109,20 +112,90 @@ def profile():
 
 
     df.drop(columns=['artists_list'], inplace=True)
-    df.to_sql('multiuser_tracks', engine, if_exists='append', index=False)
+    # Reemplaza el ranking anterior del usuario en una sola transacción
+    if not df.empty:
+        upsert_tracks(df, 'multiuser_tracks', engine, scope_columns=['user_id', 'time_range'])
+
+    return {
+        "df": df,
+        "graph_html": generar_top_tracks(df),
+        "graph_artistas_html": generar_popularidad_artistas(df),
+        "num_artistas_unicos": num_artistas_unicos
+    }
+
+def _prefetch_profile(token_info, user_id, time_range):
+    sp, _ = user_client(token_info, user_id)
+    return build_profile(sp, user_id, time_range)
+
+def prefetch_profiles(token_info, user_id):
+    for time_range in TIME_RANGES:
+        key = (user_id, time_range)
+        with pending_lock:
+            if key in pending_profiles or key in profile_cache:
+                continue
+            future = prefetch_executor.submit(_prefetch_profile, token_info, user_id, time_range)
+            pending_profiles[key] = future
+        future.add_done_callback(lambda f, key=key: _finish_prefetch(key, f))
+
+def _finish_prefetch(key, future):
+    with pending_lock:
+        # Si el usuario hizo logout mientras tanto, el resultado se descarta
+        if pending_profiles.get(key) is not future:
+            return
+        if not future.cancelled() and future.exception() is None:
+            profile_cache.set(key, future.result())
+        del pending_profiles[key]
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Prefetch failed for {key}: {future.exception()}")
+
+def wait_for_prefetch(key):
+    with pending_lock:
+        future = pending_profiles.get(key)
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=PREFETCH_WAIT_SECONDS)
+    except Exception:
+        return None
 
-    graph_html = generar_top_tracks(df)
-    graph_artistas_html = generar_popularidad_artistas(df)
+@app.route('/profile', methods=['GET'])
+def profile():
+    token_info = session.get('token_info')
+    if not token_info:
+        return redirect(url_for('login'))
+
+    time_range = request.args.get("time_range", "medium_term")
+
+    user_id = session.get('user_id')
+    print(f"Session user_id: {user_id}")
+    if not user_id:
+        return redirect(url_for('login'))
+
+    # Las vistas repetidas del mismo rango se sirven desde cache
+    cache_key = (user_id, time_range)
+    perfil = profile_cache.get(cache_key) or wait_for_prefetch(cache_key)
+    if perfil is None:
+        sp, token_info = user_client(token_info, user_id)
+        session['token_info'] = token_info
+        perfil = build_profile(sp, user_id, time_range)
+        profile_cache.set(cache_key, perfil)
 
     return render_template("success.html",
-                           graph_html=graph_html,
-                           graph_artistas_html=graph_artistas_html,
+                           graph_html=perfil["graph_html"],
+                           graph_artistas_html=perfil["graph_artistas_html"],
                            current_time_range=time_range,
-                           num_artistas_unicos=num_artistas_unicos
+                           num_artistas_unicos=perfil["num_artistas_unicos"]
 )
 
 @app.route('/logout')
 def logout():
+    user_id = session.get('user_id')
+    if user_id:
+        with pending_lock:
+            for key in [key for key in pending_profiles if key[0] == user_id]:
+                pending_profiles.pop(key).cancel()
+        profile_cache.invalidate(lambda key: key[0] == user_id)
+        clients.discard_user(user_id)
     session.clear()
     return redirect(url_for('home'))
 
@@ -0,0 +1,53 @@
+# scripts/db_engine.py
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+import os
+import threading
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def database_url():
+    # DATABASE_URL tiene prioridad; si no, se arma con las variables POSTGRES_*
+    if os.getenv('DATABASE_URL'):
+        return make_url(os.getenv('DATABASE_URL'))
+    port = os.getenv('POSTGRES_PORT')
+    return URL.create(
+        'postgresql+psycopg2',
+        username=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        host=os.getenv('POSTGRES_HOST'),
+        port=int(port) if port else None,
+        database=os.getenv('POSTGRES_DB')
+    )
+
+def pool_options():
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # RDS corta conexiones inactivas: se validan antes de usarlas y se reciclan
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800))
+    }
+
+def get_engine(url=None):
+    # Un único engine (y pool de conexiones) por proceso y URL, compartido por ETL, Flask y CLI
+    url = make_url(url) if url else database_url()
+    key = url.render_as_string(hide_password=False)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            if url.get_backend_name() == 'sqlite':
+                engine = create_engine(url)
+            else:
+                engine = create_engine(url, **pool_options())
+            _engines[key] = engine
+    return engine
+
+def dispose_engines():
+    # Cierra los pools y olvida los engines (p. ej. en procesos hijos tras un fork)
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose(close=False)
+        _engines.clear()
@@ -1,12 +1,107 @@
-from sqlalchemy import create_engine
+from sqlalchemy import text
+from scripts.db_engine import get_engine
+import csv
+import io
 import os
+import weakref
 
-def save_tracks_to_db(df):
-    user = os.getenv('POSTGRES_USER')
-    password = os.getenv('POSTGRES_PASSWORD')
-    host = os.getenv('POSTGRES_HOST')
-    port = os.getenv('POSTGRES_PORT')
-    database = os.getenv('POSTGRES_DB')
+# Filas por bloque al cargar: acota la memoria del buffer de COPY y de executemany
+BULK_CHUNKSIZE = int(os.getenv('BULK_CHUNKSIZE', 10000))
 
-    engine = create_engine(f'postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}')
-    df.to_sql('top_tracks', con=engine, if_exists='replace', index=False)
\ No newline at end of file
+def copy_rows(conn, table_name, columns, rows):
+    # COPY FROM STDIN en CSV: una sola ida y vuelta por bloque en PostgreSQL
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(f'COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+def copy_insert(table, conn, keys, data_iter):
+    # Método de inserción para DataFrame.to_sql: COPY en PostgreSQL, executemany en el resto (p. ej. SQLite)
+    if conn.dialect.name == 'postgresql':
+        table_name = f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+        copy_rows(conn, table_name, keys, data_iter)
+    else:
+        # Mismo executemany por bloque que usa pandas con method=None
+        table._execute_insert(conn, keys, data_iter)
+
+# Clave natural de las tablas de tops por usuario: una fila por posición del ranking
+TRACK_KEY = ['user_id', 'time_range', 'rank']
+
+_SQL_TYPES = {'i': 'BIGINT', 'u': 'BIGINT', 'f': 'DOUBLE PRECISION', 'b': 'BOOLEAN', 'M': 'TIMESTAMP'}
+# Tablas ya preparadas por engine, para no repetir el DDL en cada escritura
+_ensured_tables = weakref.WeakKeyDictionary()
+
+def _sql_records(df):
+    # NaN/NaT -> None y tipos de numpy/pandas -> tipos nativos de Python para el driver
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _ensure_upsert_table(engine, df, table_name, key_columns):
+    # Crea la tabla si falta, añade columnas nuevas y el índice único que necesita ON CONFLICT
+    ensured = _ensured_tables.setdefault(engine, set())
+    if table_name in ensured:
+        return
+    df.head(0).to_sql(table_name, engine, if_exists='append', index=False)
+    key_list = ', '.join(f'"{column}"' for column in key_columns)
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            for column, dtype in df.dtypes.items():
+                sql_type = _SQL_TYPES.get(dtype.kind, 'TEXT')
+                conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN IF NOT EXISTS "{column}" {sql_type}'))
+        conn.execute(text(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS "{table_name}_{"_".join(key_columns)}_key" '
+            f'ON "{table_name}" ({key_list})'
+        ))
+    ensured.add(table_name)
+
+def upsert_tracks(df, table_name, engine, key_columns=TRACK_KEY, scope_columns=None):
+    # INSERT ... ON CONFLICT idempotente en una sola transacción.
+    # Con scope_columns (p. ej. user_id, time_range) se borran además las posiciones
+    # del grupo que ya no existen, sin dejar nunca al usuario sin filas.
+    columns = list(df.columns)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    key_list = ', '.join(f'"{column}"' for column in key_columns)
+    updates = [column for column in columns if column not in key_columns]
+    if updates:
+        on_conflict = 'DO UPDATE SET ' + ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in updates)
+    else:
+        on_conflict = 'DO NOTHING'
+
+    _ensure_upsert_table(engine, df, table_name, key_columns)
+    records = _sql_records(df)
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Staging temporal cargado con COPY y un único INSERT ... SELECT
+            stage = f'"_stage_{table_name}"'
+            conn.execute(text(f'CREATE TEMP TABLE {stage} (LIKE "{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP'))
+            copy_rows(conn, stage, columns, ([record[column] for column in columns] for record in records))
+            conn.execute(text(
+                f'INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM {stage} '
+                f'ON CONFLICT ({key_list}) {on_conflict}'
+            ))
+        elif records:
+            values = ', '.join(f':{column}' for column in columns)
+            conn.execute(text(
+                f'INSERT INTO "{table_name}" ({column_list}) VALUES ({values}) '
+                f'ON CONFLICT ({key_list}) {on_conflict}'
+            ), records)
+
+        if scope_columns:
+            ordinal = [column for column in key_columns if column not in scope_columns][0]
+            condition = ' AND '.join(f'"{column}" = :{column}' for column in scope_columns)
+            for scope, group in df.groupby(list(scope_columns)):
+                params = dict(zip(scope_columns, scope if isinstance(scope, tuple) else (scope,)))
+                params['max_ordinal'] = int(group[ordinal].max())
+                conn.execute(text(
+                    f'DELETE FROM "{table_name}" WHERE {condition} '
+                    f'AND ("{ordinal}" > :max_ordinal OR "{ordinal}" IS NULL)'
+                ), params)
+
+def save_tracks_to_db(df, mode='replace', engine=None):
+    engine = engine or get_engine()
+    if mode == 'upsert':
+        upsert_tracks(df, 'top_tracks', engine, key_columns=['track_id'])
+    else:
+        df.to_sql('top_tracks', con=engine, if_exists='replace', index=False,
+                  method=copy_insert, chunksize=BULK_CHUNKSIZE)
@@ -1,11 +1,11 @@
-# main.py
+# main.py  (ejecutar desde la raíz: python -m scripts.main)
 
-from spotify_etl import get_top_tracks
-from db_utils import save_tracks_to_db
+from scripts.spotify_etl import get_top_tracks
+from scripts.db_utils import save_tracks_to_db
 
 def main():
     print("Obteniendo canciones más escuchadas de Spotify...")
-    df = get_top_tracks(50, 0, "medium_term")
+    df, _ = get_top_tracks(50, 0, "medium_term")
     
     print("Guardando en la base de datos...")
     save_tracks_to_db(df)
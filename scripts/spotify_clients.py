@@ -0,0 +1,84 @@
+# scripts/spotify_clients.py
+import os
+import threading
+import time
+
+import spotipy
+from spotipy.cache_handler import CacheFileHandler
+
+from scripts.cache import TTLCache
+from scripts.spotify_scheduler import scheduler, spotify_session
+
+# Margen (segundos) antes de la expiración con el que se refresca un token
+TOKEN_REFRESH_MARGIN = 60
+
+class CachedTokenHandler(CacheFileHandler):
+    """CacheFileHandler que mantiene el token en memoria: el fichero solo se lee una vez y se escribe al refrescar."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token_info = None
+        self._lock = threading.Lock()
+
+    def get_cached_token(self):
+        with self._lock:
+            if self._token_info is None:
+                self._token_info = super().get_cached_token()
+            return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        with self._lock:
+            self._token_info = token_info
+            super().save_token_to_cache(token_info)
+
+def token_expiring(token_info):
+    expires_at = token_info.get('expires_at')
+    return expires_at is not None and expires_at - time.time() < TOKEN_REFRESH_MARGIN
+
+class ClientRegistry:
+    """Reutiliza clientes de Spotify y auth managers por clave (scope o usuario) sobre una sesión HTTP keep-alive."""
+
+    def __init__(self, scheduler, maxsize=1024, ttl=3600):
+        self.scheduler = scheduler
+        self._objects = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        # Una sola sesión (pool de conexiones TLS reutilizables) para todos los clientes
+        with self._lock:
+            if self._session is None:
+                self._session = spotify_session()
+            return self._session
+
+    def get_or_create(self, key, factory):
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = factory()
+                self._objects.set(key, obj)
+            return obj
+
+    def new_client(self, **kwargs):
+        return self.scheduler.wrap(spotipy.Spotify(requests_session=self.session, **kwargs))
+
+    def user_client(self, token_info, oauth=None, user_id=None):
+        # Refresca el token si está por caducar y lo actualiza en el mismo cliente.
+        # Devuelve (cliente, token_info) para que el llamador guarde el token vigente.
+        if oauth is not None and token_info.get('refresh_token') and token_expiring(token_info):
+            token_info = oauth.refresh_access_token(token_info['refresh_token'])
+        if user_id is None:
+            return self.new_client(auth=token_info['access_token']), token_info
+        sp = self.get_or_create(('user', user_id), lambda: self.new_client(auth=token_info['access_token']))
+        sp.client.set_auth(token_info['access_token'])
+        return sp, token_info
+
+    def discard_user(self, user_id):
+        self._objects.pop(('user', user_id))
+
+    def clear(self):
+        self._objects.clear()
+
+# Registro compartido por el ETL y la app Flask
+clients = ClientRegistry(scheduler, maxsize=int(os.getenv('SPOTIFY_CLIENT_CACHE_SIZE', 1024)))
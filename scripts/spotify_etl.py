@@ -4,26 +4,50 @@ from pathlib import Path
 from spotipy.oauth2 import SpotifyOAuth
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+from scripts.spotify_clients import clients, CachedTokenHandler
 
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 
 def connection_api(scope):
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+    # Un cliente por scope reutilizado entre llamadas: misma sesión HTTP y token en memoria,
+    # refrescado por el auth manager cuando caduca. Las llamadas pasan por el scheduler.
+    return clients.get_or_create(('scope', scope), lambda: clients.new_client(auth_manager=SpotifyOAuth(
         scope=scope,
         client_id=os.getenv("SPOTIPY_CLIENT_ID"),
         client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI")
-))
-    return sp
+        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+        cache_handler=CachedTokenHandler()
+)))
+
+# Máximos por petición de cada endpoint y peticiones simultáneas a la API
+TOP_TRACKS_PAGE_SIZE = 50
+AUDIO_FEATURES_BATCH_SIZE = 100
+SPOTIFY_MAX_WORKERS = int(os.getenv("SPOTIFY_MAX_WORKERS", 4))
+
+def fetch_concurrently(fn, args_list, max_workers=SPOTIFY_MAX_WORKERS):
+    # Ejecuta fn(*args) para cada elemento con un pool acotado y devuelve los resultados en orden
+    if len(args_list) <= 1:
+        return [fn(*args) for args in args_list]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(args_list))) as pool:
+        return list(pool.map(lambda args: fn(*args), args_list))
+
+def page_ranges(limit, offset, page_size=TOP_TRACKS_PAGE_SIZE):
+    # [(limit, offset), ...] de cada página necesaria para cubrir limit items desde offset
+    end = offset + limit
+    return [(min(page_size, end - start), start) for start in range(offset, end, page_size)]
 
 def get_top_tracks(limit, offset, time_range):
     sp = connection_api("user-top-read user-read-recently-played")
-    results = sp.current_user_top_tracks(limit, offset, time_range)
+    pages = fetch_concurrently(
+        lambda page_limit, page_offset: sp.current_user_top_tracks(page_limit, page_offset, time_range),
+        page_ranges(limit, offset)
+    )
 
     tracks_ids = []
     data = []
-    for item in results['items']:
+    for item in (item for page in pages for item in page['items']):
         data.append({
             'track_id': item['id'],
             'track_name': item['name'],
@@ -44,12 +68,13 @@ def get_top_tracks(limit, offset, time_range):
 def get_audio_features(tracks):
     sp = connection_api("user-top-read")  # este scope es suficiente
 
-    features = []
-    # La API acepta máximo 100 ids por petición
-    for i in range(0, len(tracks), 50):
-        batch = tracks[i:i + 50]
-        audio_features = sp.audio_features(batch)
-        features.extend(audio_features)
+    # La API acepta máximo 100 ids por petición; los lotes se piden en paralelo
+    batches = [(tracks[i:i + AUDIO_FEATURES_BATCH_SIZE],)
+               for i in range(0, len(tracks), AUDIO_FEATURES_BATCH_SIZE)]
+    results = fetch_concurrently(sp.audio_features, batches)
+
+    # Los ids desconocidos vuelven como None
+    features = [feature for batch in results for feature in (batch or []) if feature is not None]
 
     df_features = pd.DataFrame(features)
     df_features.to_csv('data/audio_features.csv', index=False)
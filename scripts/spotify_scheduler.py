@@ -0,0 +1,159 @@
+# scripts/spotify_scheduler.py
+import os
+import random
+import threading
+import time
+
+import requests
+from spotipy.exceptions import SpotifyException
+from urllib3.util.retry import Retry
+
+# Códigos que se reintentan: throttling (429) y errores transitorios del servidor
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def _endpoint_limits(value):
+    # "audio_features=2,current_user_top_tracks=4" -> {'audio_features': 2, ...}
+    limits = {}
+    for part in filter(None, (p.strip() for p in value.split(','))):
+        name, _, limit = part.partition('=')
+        limits[name.strip()] = int(limit)
+    return limits
+
+def spotify_session():
+    # Sesión HTTP sin reintentos por status: los 429/5xx llegan al scheduler con sus headers (Retry-After)
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=False, status=0, status_forcelist=None,
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']))
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class TokenBucket:
+    """Limita el ritmo sostenido de peticiones (rate por segundo) permitiendo ráfagas de hasta capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class RequestScheduler:
+    """Punto único por el que pasan las llamadas a Spotify: ritmo global, concurrencia por endpoint y reintentos."""
+
+    def __init__(self, rate=10.0, burst=20, max_retries=5, backoff_base=0.5, backoff_max=30.0,
+                 max_concurrency=8, endpoint_limits=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = endpoint_limits or {}
+        self._semaphores = {}
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'throttled': 0, 'retried': 0, 'failed': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rate=float(os.getenv('SPOTIFY_RATE_LIMIT', 10)),
+            burst=int(os.getenv('SPOTIFY_RATE_BURST', 20)),
+            max_retries=int(os.getenv('SPOTIFY_MAX_RETRIES', 5)),
+            max_concurrency=int(os.getenv('SPOTIFY_MAX_CONCURRENCY', 8)),
+            endpoint_limits=_endpoint_limits(os.getenv('SPOTIFY_ENDPOINT_CONCURRENCY', ''))
+        )
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _semaphore(self, endpoint):
+        with self._lock:
+            if endpoint not in self._semaphores:
+                limit = self.endpoint_limits.get(endpoint, self.max_concurrency)
+                self._semaphores[endpoint] = threading.BoundedSemaphore(limit)
+            return self._semaphores[endpoint]
+
+    def _wait_turn(self):
+        # Un 429 pausa a todos los llamadores hasta que venza su Retry-After
+        while True:
+            with self._lock:
+                wait = self._blocked_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self.bucket.acquire()
+
+    def _backoff(self, attempt):
+        # Backoff exponencial con jitter completo
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_delay(self, error, attempt):
+        if error.http_status == 429:
+            retry_after = (getattr(error, 'headers', None) or {}).get('Retry-After')
+            if retry_after is not None:
+                delay = float(retry_after) + random.uniform(0, self.backoff_base)
+                with self._lock:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                return delay
+        return self._backoff(attempt)
+
+    def call(self, endpoint, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            self._wait_turn()
+            self._count('calls')
+            try:
+                with self._semaphore(endpoint):
+                    return fn(*args, **kwargs)
+            except SpotifyException as error:
+                if error.http_status == 429:
+                    self._count('throttled')
+                if error.http_status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self._count('failed')
+                    raise
+                delay = self._retry_delay(error, attempt)
+            self._count('retried')
+            attempt += 1
+            time.sleep(delay)
+
+    def wrap(self, client):
+        return ScheduledSpotify(self, client)
+
+class ScheduledSpotify:
+    """Envuelve un spotipy.Spotify: cada método público pasa por el scheduler."""
+
+    def __init__(self, scheduler, client):
+        self._scheduler = scheduler
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call(name, attr, *args, **kwargs)
+
+        return scheduled
+
+# Scheduler compartido por todo el proceso (la cuota de la API es por aplicación)
+scheduler = RequestScheduler.from_env()
@@ -0,0 +1,79 @@
+import pytest
+import sys
+from unittest.mock import patch
+
+sys.path.append('/Users/andreaaranda/Desktop/spotify-pipeline')
+from scripts.cache import TTLCache
+
+class TestTTLCache:
+
+    def test_get_and_set(self):
+        """Test basic storage and retrieval"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set(('user1', 'short_term'), 'value')
+
+        assert cache.get(('user1', 'short_term')) == 'value'
+        assert cache.get(('user1', 'long_term')) is None
+        assert cache.get(('user1', 'long_term'), 'default') == 'default'
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries are dropped once their TTL has passed"""
+        cache = TTLCache(maxsize=10, ttl=30)
+
+        with patch('scripts.cache.time.monotonic', return_value=100.0):
+            cache.set('key', 'value')
+        with patch('scripts.cache.time.monotonic', return_value=129.0):
+            assert cache.get('key') == 'value'
+        with patch('scripts.cache.time.monotonic', return_value=131.0):
+            assert cache.get('key') is None
+
+        assert len(cache) == 0
+
+    def test_ttl_none_never_expires(self):
+        """Test that a cache without TTL keeps entries until evicted"""
+        cache = TTLCache(maxsize=10, ttl=None)
+
+        with patch('scripts.cache.time.monotonic', return_value=0.0):
+            cache.set('key', 'value')
+        with patch('scripts.cache.time.monotonic', return_value=10 ** 9):
+            assert cache.get('key') == 'value'
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # Accessing 'a' makes 'b' the least recently used
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert len(cache) == 2
+
+    def test_invalidate_by_predicate(self):
+        """Test invalidation of every key belonging to one user"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set(('user1', 'short_term'), 1)
+        cache.set(('user1', 'long_term'), 2)
+        cache.set(('user2', 'short_term'), 3)
+
+        removed = cache.invalidate(lambda key: key[0] == 'user1')
+
+        assert removed == 2
+        assert ('user2', 'short_term') in cache
+        assert len(cache) == 1
+
+    def test_pop_and_clear(self):
+        """Test explicit removal of entries"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+
+        cache.clear()
+        assert len(cache) == 0
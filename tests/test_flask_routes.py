@@ -1,5 +1,6 @@
 import pytest
 import sys
+import time
 from unittest.mock import Mock, patch, MagicMock
 import pandas as pd
 from flask import session
@@ -270,4 +271,114 @@ class TestFlaskRoutes:
         # This test verifies that the app can start with proper env vars
         # The actual values are mocked in the patch decorator
         response = flask_app.get('/')
-        assert response.status_code == 200 or response.status_code == 500  # 500 if template missing
\ No newline at end of file
+        assert response.status_code == 200 or response.status_code == 500  # 500 if template missing
+    @patch('run.spotipy.Spotify')
+    @patch('run.generar_top_tracks', return_value='<div>tracks chart</div>')
+    @patch('run.generar_popularidad_artistas', return_value='<div>artists chart</div>')
+    @patch('run.engine')
+    def test_profile_route_serves_repeat_views_from_cache(self, mock_engine, mock_gen_artists, mock_gen_tracks, mock_spotify, flask_app):
+        """Test that a repeated (user_id, time_range) view skips Spotify, DB and plotting"""
+        mock_sp = Mock()
+        mock_sp.current_user_top_tracks.return_value = {
+            'items': [
+                {
+                    'name': 'Cached Track',
+                    'artists': [{'name': 'Cached Artist'}],
+                    'album': {'name': 'Cached Album', 'release_date': '2023-01-01'},
+                    'popularity': 70,
+                    'external_urls': {'spotify': 'https://test.url'}
+                }
+            ]
+        }
+        mock_spotify.return_value = mock_sp
+        mock_engine.begin.return_value.__enter__.return_value = Mock()
+
+        with flask_app.session_transaction() as sess:
+            sess['token_info'] = {'access_token': 'test_token'}
+            sess['user_id'] = 'cache_user'
+
+        with patch('pandas.DataFrame.to_sql') as mock_to_sql:
+            first = flask_app.get('/profile?time_range=short_term')
+            second = flask_app.get('/profile?time_range=short_term')
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert b'tracks chart' in second.data
+        assert mock_sp.current_user_top_tracks.call_count == 1
+        assert mock_to_sql.call_count == 1
+        assert mock_gen_tracks.call_count == 1
+
+    def test_logout_invalidates_cached_profiles(self, flask_app):
+        """Test that logout drops every cached time range for the user"""
+        from run import profile_cache
+
+        profile_cache.set(('logout_user', 'short_term'), {'graph_html': ''})
+        profile_cache.set(('logout_user', 'long_term'), {'graph_html': ''})
+        profile_cache.set(('other_user', 'short_term'), {'graph_html': ''})
+
+        with flask_app.session_transaction() as sess:
+            sess['token_info'] = {'access_token': 'test_token'}
+            sess['user_id'] = 'logout_user'
+
+        flask_app.get('/logout')
+
+        assert ('logout_user', 'short_term') not in profile_cache
+        assert ('logout_user', 'long_term') not in profile_cache
+        assert ('other_user', 'short_term') in profile_cache
+
+    @patch('run.SpotifyOAuth')
+    @patch('run.spotipy.Spotify')
+    @patch('run.build_profile')
+    def test_callback_prefetches_all_time_ranges(self, mock_build_profile, mock_spotify, mock_oauth, flask_app):
+        """Test that the OAuth callback warms the cache for every time range"""
+        import run
+
+        mock_oauth.return_value.get_access_token.return_value = {'access_token': 'test_token'}
+        mock_spotify.return_value.current_user.return_value = {'id': 'prefetch_user'}
+        mock_build_profile.side_effect = lambda sp, user_id, time_range: {
+            'graph_html': f'<div>{time_range}</div>',
+            'graph_artistas_html': '',
+            'num_artistas_unicos': 1
+        }
+
+        run.app.config['PROFILE_PREFETCH'] = True
+        try:
+            response = flask_app.get('/callback?code=test_auth_code')
+            deadline = time.monotonic() + 5
+            while run.pending_profiles and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            run.app.config['PROFILE_PREFETCH'] = False
+
+        assert response.status_code == 302
+        called_ranges = sorted(call[0][2] for call in mock_build_profile.call_args_list)
+        assert called_ranges == sorted(run.TIME_RANGES)
+        for time_range in run.TIME_RANGES:
+            assert run.profile_cache.get(('prefetch_user', time_range))['graph_html'] == f'<div>{time_range}</div>'
+
+    @patch('run.spotipy.Spotify')
+    def test_profile_route_uses_pending_prefetch(self, mock_spotify, flask_app):
+        """Test that profile waits on an in-flight prefetch instead of calling Spotify again"""
+        from concurrent.futures import Future
+        import run
+
+        future = Future()
+        future.set_result({
+            'graph_html': '<div>prefetched</div>',
+            'graph_artistas_html': '',
+            'num_artistas_unicos': 3
+        })
+        run.pending_profiles[('pending_user', 'long_term')] = future
+
+        with flask_app.session_transaction() as sess:
+            sess['token_info'] = {'access_token': 'test_token'}
+            sess['user_id'] = 'pending_user'
+
+        try:
+            response = flask_app.get('/profile?time_range=long_term')
+        finally:
+            run.pending_profiles.pop(('pending_user', 'long_term'), None)
+
+        assert response.status_code == 200
+        assert b'prefetched' in response.data
+        assert not mock_spotify.return_value.current_user_top_tracks.called
@@ -11,13 +11,12 @@ class TestIntegration:
     """Integration tests for the complete Spotify pipeline"""
     
     @patch('scripts.spotify_etl.connection_api')
-    @patch('scripts.db_utils.create_engine')
-    @patch('scripts.db_utils.os.getenv')
+    @patch('scripts.db_utils.get_engine')
     @patch('pandas.DataFrame.to_sql')
-    def test_complete_etl_pipeline(self, mock_to_sql, mock_getenv, mock_create_engine, mock_connection):
+    def test_complete_etl_pipeline(self, mock_to_sql, mock_get_engine, mock_connection):
         """Test complete ETL pipeline from Spotify API to database"""
         from scripts.spotify_etl import get_top_tracks
-        from scripts.db_utils import save_tracks_to_db
+        from scripts.db_utils import save_tracks_to_db, copy_insert, BULK_CHUNKSIZE
         
         # Setup Spotify API mock
         mock_sp = Mock()
@@ -40,16 +39,8 @@ class TestIntegration:
         mock_connection.return_value = mock_sp
         
         # Setup database mocks
-        env_vars = {
-            'POSTGRES_USER': 'test_user',
-            'POSTGRES_PASSWORD': 'test_password',
-            'POSTGRES_HOST': 'localhost',
-            'POSTGRES_PORT': '5432',
-            'POSTGRES_DB': 'test_db'
-        }
-        mock_getenv.side_effect = lambda key: env_vars.get(key)
         mock_engine = Mock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
         
         # Execute ETL pipeline
         with patch('pandas.DataFrame.to_csv'):  # Mock CSV saving
@@ -66,7 +57,9 @@ class TestIntegration:
             'top_tracks',
             con=mock_engine,
             if_exists='replace',
-            index=False
+            index=False,
+            method=copy_insert,
+            chunksize=BULK_CHUNKSIZE
         )
     
     @patch('scripts.spotify_etl.connection_api')
@@ -5,7 +5,7 @@ import os
 import sys
 
 sys.path.append('/Users/andreaaranda/Desktop/spotify-pipeline')
-from scripts.spotify_etl import connection_api, get_top_tracks, get_audio_features
+from scripts.spotify_etl import connection_api, get_top_tracks, get_audio_features, page_ranges
 
 class TestSpotifyETL:
     
@@ -32,9 +32,9 @@ class TestSpotifyETL:
             redirect_uri='test_uri'
         )
         
-        # Verify Spotify client was created
+        # Verify Spotify client was created and routed through the request scheduler
         mock_spotify.assert_called_once()
-        assert result == mock_spotify.return_value
+        assert result.client == mock_spotify.return_value
     
     @patch('scripts.spotify_etl.connection_api')
     @patch('pandas.DataFrame.to_csv')
@@ -163,22 +163,38 @@ class TestSpotifyETL:
         mock_sp = Mock()
         mock_connection.return_value = mock_sp
         
-        # Create 75 track IDs to test batching (should be processed in 2 batches of 50 and 25)
-        track_ids = [f'track{i}' for i in range(75)]
+        # Create 150 track IDs to test batching (should be processed in 2 batches of 100 and 50)
+        track_ids = [f'track{i}' for i in range(150)]
         
         # Mock API responses for batches
-        batch1_response = [{'id': f'track{i}', 'danceability': 0.8} for i in range(50)]
-        batch2_response = [{'id': f'track{i}', 'danceability': 0.8} for i in range(50, 75)]
-        
-        mock_sp.audio_features.side_effect = [batch1_response, batch2_response]
+        mock_sp.audio_features.side_effect = lambda batch: [{'id': track_id, 'danceability': 0.8} for track_id in batch]
         
         df_features = get_audio_features(track_ids)
         
-        # Verify API was called twice (for batching)
+        # Verify API was called twice (for batching) at the endpoint maximum of 100 ids
         assert mock_sp.audio_features.call_count == 2
+        batch_sizes = sorted(len(call[0][0]) for call in mock_sp.audio_features.call_args_list)
+        assert batch_sizes == [50, 100]
         
-        # Verify DataFrame has all tracks
-        assert len(df_features) == 75
+        # Verify DataFrame has all tracks, in the original order
+        assert len(df_features) == 150
+        assert list(df_features['id']) == track_ids
+
+    @patch('scripts.spotify_etl.connection_api')
+    @patch('pandas.DataFrame.to_csv')
+    def test_get_audio_features_skips_unknown_tracks(self, mock_to_csv, mock_connection):
+        """Test that None entries returned for unknown ids are dropped"""
+        mock_sp = Mock()
+        mock_connection.return_value = mock_sp
+        mock_sp.audio_features.return_value = [
+            {'id': 'track1', 'danceability': 0.8},
+            None,
+            {'id': 'track3', 'danceability': 0.6}
+        ]
+
+        df_features = get_audio_features(['track1', 'unknown', 'track3'])
+
+        assert list(df_features['id']) == ['track1', 'track3']
     
     @patch('scripts.spotify_etl.connection_api')
     def test_get_audio_features_empty_list(self, mock_connection):
@@ -213,4 +229,41 @@ class TestSpotifyETL:
                     for scope in scopes:
                         result = connection_api(scope)
                         # Verify that the function works with different scopes
-                        assert result == mock_spotify.return_value
\ No newline at end of file
+                        assert result.client == mock_spotify.return_value
+
+    def test_page_ranges(self):
+        """Test page offsets computed for limits beyond one 50-item page"""
+        assert page_ranges(50, 0) == [(50, 0)]
+        assert page_ranges(120, 0) == [(50, 0), (50, 50), (20, 100)]
+        assert page_ranges(60, 10) == [(50, 10), (10, 60)]
+        assert page_ranges(0, 0) == []
+
+    @patch('scripts.spotify_etl.connection_api')
+    @patch('pandas.DataFrame.to_csv')
+    def test_get_top_tracks_paginates_in_order(self, mock_to_csv, mock_connection):
+        """Test that limits above 50 fetch every page and keep the ranking order"""
+        mock_sp = Mock()
+        mock_connection.return_value = mock_sp
+
+        def fake_page(limit, offset, time_range):
+            return {'items': [
+                {
+                    'id': f'track{i}',
+                    'name': f'Track {i}',
+                    'artists': [{'name': 'Artist', 'id': 'artist'}],
+                    'album': {'name': 'Album', 'id': 'album', 'release_date': '2023-01-01'},
+                    'popularity': 50,
+                    'external_urls': {'spotify': f'https://open.spotify.com/track/track{i}'}
+                }
+                for i in range(offset, offset + limit)
+            ]}
+
+        mock_sp.current_user_top_tracks.side_effect = fake_page
+
+        df, track_ids = get_top_tracks(120, 0, "long_term")
+
+        assert mock_sp.current_user_top_tracks.call_count == 3
+        called_pages = sorted((call[0] for call in mock_sp.current_user_top_tracks.call_args_list), key=lambda args: args[1])
+        assert called_pages == [(50, 0, 'long_term'), (50, 50, 'long_term'), (20, 100, 'long_term')]
+        assert len(df) == 120
+        assert track_ids == [f'track{i}' for i in range(120)]
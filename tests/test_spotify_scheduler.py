@@ -0,0 +1,131 @@
+import pytest
+import sys
+from unittest.mock import Mock, patch
+from spotipy.exceptions import SpotifyException
+
+sys.path.append('/Users/andreaaranda/Desktop/spotify-pipeline')
+from scripts.spotify_scheduler import RequestScheduler, TokenBucket, _endpoint_limits
+
+class FakeClock:
+    """Deterministic clock: sleeping advances monotonic time instantly"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestRequestScheduler:
+
+    @pytest.fixture
+    def clock(self):
+        clock = FakeClock()
+        with patch('scripts.spotify_scheduler.time.monotonic', side_effect=clock.monotonic), \
+                patch('scripts.spotify_scheduler.time.sleep', side_effect=clock.sleep):
+            yield clock
+
+    @pytest.fixture
+    def scheduler(self):
+        """Scheduler with a generous bucket so tests never wait on the rate limit"""
+        return RequestScheduler(rate=1000, burst=1000, max_retries=3, backoff_base=0.01)
+
+    def test_wrapped_client_proxies_calls(self, scheduler):
+        """Test that wrapped clients forward calls and count them"""
+        client = Mock()
+        client.current_user.return_value = {'id': 'user1'}
+
+        sp = scheduler.wrap(client)
+
+        assert sp.current_user() == {'id': 'user1'}
+        client.current_user.assert_called_once_with()
+        assert scheduler.stats()['calls'] == 1
+
+    def test_honors_retry_after_on_429(self, clock, scheduler):
+        """Test that a 429 waits at least Retry-After seconds and then retries"""
+        client = Mock()
+        client.current_user_top_tracks.side_effect = [
+            SpotifyException(429, -1, 'rate limited', headers={'Retry-After': '2'}),
+            {'items': []}
+        ]
+
+        result = scheduler.wrap(client).current_user_top_tracks(limit=50)
+
+        assert result == {'items': []}
+        assert client.current_user_top_tracks.call_count == 2
+        assert clock.sleeps[0] >= 2
+        assert clock.now >= 2
+        stats = scheduler.stats()
+        assert stats['throttled'] == 1
+        assert stats['retried'] == 1
+        assert stats['failed'] == 0
+
+    def test_retries_server_errors_with_backoff(self, clock, scheduler):
+        """Test that transient 5xx errors are retried with jittered backoff"""
+        client = Mock()
+        client.audio_features.side_effect = [
+            SpotifyException(503, -1, 'unavailable'),
+            SpotifyException(502, -1, 'bad gateway'),
+            [{'id': 'track1'}]
+        ]
+
+        result = scheduler.wrap(client).audio_features(['track1'])
+
+        assert result == [{'id': 'track1'}]
+        assert scheduler.stats()['retried'] == 2
+        assert len(clock.sleeps) == 2
+        for delay in clock.sleeps:
+            assert 0 <= delay <= scheduler.backoff_max
+
+    def test_gives_up_after_max_retries(self, clock, scheduler):
+        """Test that persistent throttling is eventually raised"""
+        client = Mock()
+        client.current_user.side_effect = SpotifyException(429, -1, 'rate limited', headers={'Retry-After': '1'})
+
+        with pytest.raises(SpotifyException):
+            scheduler.wrap(client).current_user()
+
+        assert client.current_user.call_count == scheduler.max_retries + 1
+        assert scheduler.stats()['failed'] == 1
+
+    def test_client_errors_are_not_retried(self, scheduler):
+        """Test that non-retryable errors fail fast"""
+        client = Mock()
+        client.current_user.side_effect = SpotifyException(401, -1, 'expired token')
+
+        with pytest.raises(SpotifyException):
+            scheduler.wrap(client).current_user()
+
+        assert client.current_user.call_count == 1
+        assert scheduler.stats()['retried'] == 0
+
+    def test_per_endpoint_concurrency_limits(self):
+        """Test that each endpoint gets its own bounded semaphore"""
+        scheduler = RequestScheduler(max_concurrency=8, endpoint_limits={'audio_features': 2})
+
+        assert scheduler._semaphore('audio_features')._initial_value == 2
+        assert scheduler._semaphore('current_user_top_tracks')._initial_value == 8
+        assert scheduler._semaphore('audio_features') is scheduler._semaphore('audio_features')
+
+    def test_endpoint_limits_parsing(self):
+        """Test parsing of SPOTIFY_ENDPOINT_CONCURRENCY"""
+        assert _endpoint_limits('audio_features=2, current_user_top_tracks=4') == {
+            'audio_features': 2,
+            'current_user_top_tracks': 4
+        }
+        assert _endpoint_limits('') == {}
+
+    @patch('scripts.spotify_scheduler.time.sleep')
+    def test_token_bucket_waits_when_empty(self, mock_sleep):
+        """Test that the bucket sleeps once its burst is spent"""
+        times = iter([0.0, 0.0, 0.0, 0.5])
+        with patch('scripts.spotify_scheduler.time.monotonic', side_effect=lambda: next(times)):
+            bucket = TokenBucket(rate=2, capacity=1)
+            bucket.acquire()
+            bucket.acquire()
+
+        mock_sleep.assert_called_once_with(0.5)